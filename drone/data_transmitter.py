@@ -1,31 +1,54 @@
 import aiohttp
 import base64
+import orjson
 import cv2
 import numpy as np
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import logging
 import asyncio
 from datetime import datetime
 
+# one connection pool shared by every transmitter in the process
+_SESSION: Optional[aiohttp.ClientSession] = None
+
+async def get_session() -> aiohttp.ClientSession:
+    """Get the shared aiohttp session, creating it on first use"""
+    global _SESSION
+    if _SESSION is None or _SESSION.closed:
+        _SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=100,
+                ttl_dns_cache=300,
+                keepalive_timeout=60
+            )
+        )
+    return _SESSION
+
+async def close_session():
+    """Close the shared aiohttp session"""
+    global _SESSION
+    if _SESSION is not None:
+        await _SESSION.close()
+        _SESSION = None
+
 class DataTransmitter:
-    def __init__(self, endpoint: str):
+    def __init__(self, endpoint: str, max_image_side: Optional[int] = None):
         self.endpoint = endpoint
-        self.session = None
         self.logger = logging.getLogger(__name__)
         self.retry_delay = 1  # seconds
         self.max_retries = 3
-
-    async def _ensure_session(self):
-        """Ensure aiohttp session exists"""
-        if self.session is None:
-            self.session = aiohttp.ClientSession()
+        # long side in pixels for transmitted frames; None keeps the full
+        # resolution, since the server stores these frames as evidence
+        self.max_image_side = max_image_side
 
     async def send_event(self, event_data: Dict[str, Any]) -> bool:
         """Send event data to server"""
-        await self._ensure_session()
+        session = await get_session()
         
         try:
-            image_data = self._prepare_image(event_data['frame'])
+            # frames arrive JPEG-encoded; base64 is only for the JSON body
+            image_data = base64.b64encode(event_data['frame_jpeg']).decode('ascii')
+            confidences = event_data['detections']['confidence']
             
             payload = {
                 "timestamp": event_data['timestamp'],
@@ -38,13 +61,23 @@ class DataTransmitter:
                     "land_use": event_data['location']['land_use']
                 },
                 "analysis": event_data['analysis'],
-                "image_data": image_data
+                "image_data": image_data,
+                "detection_confidence": float(confidences.max()) if len(confidences) else 0.0,
+                "detection_data": event_data['detections']
             }
 
+            # serialize once; retries resend the same body. detection columns
+            # are numpy arrays, which orjson encodes natively
+            body = orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+
             # send data with retries
             for attempt in range(self.max_retries):
                 try:
-                    async with self.session.post(self.endpoint, json=payload) as response:
+                    async with session.post(
+                        self.endpoint,
+                        data=body,
+                        headers={"Content-Type": "application/json"}
+                    ) as response:
                         if response.status == 200:
                             return True
                         else:
@@ -64,17 +97,24 @@ class DataTransmitter:
             self.logger.error(f"Error sending event: {e}")
             return False
 
-    def _prepare_image(self, frame: np.ndarray) -> str:
-        """Convert frame to base64 encoded string"""
+    def encode_frame(self, frame: np.ndarray) -> bytes:
+        """JPEG-encode a frame for transmission, downscaled if max_image_side is set"""
         try:
-            _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-            return base64.b64encode(buffer).decode('utf-8')
+            height, width = frame.shape[:2]
+            scale = self.max_image_side / max(height, width) if self.max_image_side else 1
+            if scale < 1:
+                frame = cv2.resize(
+                    frame,
+                    (int(width * scale), int(height * scale)),
+                    interpolation=cv2.INTER_AREA
+                )
+            
+            _, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), 80])
+            return buffer.tobytes()
         except Exception as e:
-            self.logger.error(f"Error preparing image: {e}")
-            return ""
+            self.logger.error(f"Error encoding frame: {e}")
+            return b""
 
     async def close(self):
-        """Close the session"""
-        if self.session:
-            await self.session.close()
-            self.session = None
\ No newline at end of file
+        """Close the shared session; call once at shutdown"""
+        await close_session()
\ No newline at end of file
@@ -1,13 +1,16 @@
 import serial
 import pynmea2
 import threading
+import functools
 from dataclasses import dataclass
 from typing import Optional, Tuple
 import rasterio
+from rasterio.windows import Window
 import geopandas as gpd
 from shapely.geometry import Point
 import time
 import numpy as np
+from slope import slope_kernel
 from enum import Enum
 
 class TerrainType(Enum):
@@ -20,7 +23,7 @@ class TerrainType(Enum):
     GRASSLAND = "grassland"
     DESERT = "desert"
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class GeospatialData:
     latitude: float
     longitude: float
@@ -42,6 +45,14 @@ class GeospatialModule:
         # Load terrain and land use data
         self.terrain_data = rasterio.open('data/terrain.tif')
         self.land_use_data = gpd.read_file('data/land_use.gpkg')
+        self._land_use_sindex = self.land_use_data.sindex  # STRtree over land use polygons
+        
+        # cell size and elevation window are fixed for the raster
+        self._cell_size = abs(self.terrain_data.transform[0])
+        self._window_size = 3
+        
+        # terrain/land use results per ~11 m tile (coords rounded to 4 decimals)
+        self._tile_cache = functools.lru_cache(maxsize=4096)(self._compute_tile)
 
         # Classification thresholds
         self.ELEVATION_THRESHOLDS = {
@@ -66,6 +77,8 @@ class GeospatialModule:
 
     def _gps_loop(self):
         """Main GPS reading loop"""
+        # readline() blocks until a sentence arrives or the 1 s timeout passes,
+        # which paces the loop and bounds how long stop() waits
         with serial.Serial(self.gps_port, 9600, timeout=1) as ser:
             while self.running:
                 try:
@@ -75,33 +88,24 @@ class GeospatialModule:
                         self._update_location(msg)
                 except Exception as e:
                     print(f"GPS error: {e}")
-                time.sleep(0.1)
 
-    def _get_elevation_matrix(self, lon: float, lat: float, window_size: int = 3) -> np.ndarray:
+    def _get_elevation_matrix(self, lon: float, lat: float) -> np.ndarray:
         """Get elevation matrix centered on the point"""
-        matrix = np.zeros((window_size, window_size))
-        cell_size = abs(self.terrain_data.transform[0])  # Get cell size from transform
-        
-        for i in range(window_size):
-            for j in range(window_size):
-                x_offset = (i - window_size//2) * cell_size
-                y_offset = (j - window_size//2) * cell_size
-                sample_lon = lon + x_offset
-                sample_lat = lat + y_offset
-                
-                try:
-                    elevation = list(self.terrain_data.sample([(sample_lon, sample_lat)]))[0]
-                    matrix[i, j] = elevation
-                except Exception:
-                    matrix[i, j] = matrix[i-1, j] if i > 0 else 0  # Use nearby value or 0
-                    
-        return matrix
+        # read the whole window in one block fetch; cells outside the raster are 0
+        row, col = self.terrain_data.index(lon, lat)
+        half = self._window_size // 2
+        window = Window(col - half, row - half, self._window_size, self._window_size)
+        
+        return self.terrain_data.read(
+            1,
+            window=window,
+            boundless=True,
+            fill_value=0
+        ).astype(np.float64)
 
     def _calculate_slope(self, elevation_matrix: np.ndarray, cell_size: float) -> float:
         """Calculate slope from elevation matrix"""
-        dy, dx = np.gradient(elevation_matrix, cell_size)
-        slope = np.arctan(np.sqrt(dx**2 + dy**2))
-        return float(np.degrees(slope).mean())
+        return float(slope_kernel(elevation_matrix, cell_size))
 
     def _classify_terrain(self, terrain_data: dict) -> Tuple[str, float, str]:
         """
@@ -186,30 +190,46 @@ class GeospatialModule:
         }
         return descriptions.get(terrain_type, "Undefined terrain type")
 
-    def _update_location(self, msg):
-        """Update location data with terrain analysis"""
-        point = Point(msg.longitude, msg.latitude)
+    def _compute_tile(self, lat: float, lon: float) -> Tuple[str, float, str, str]:
+        """
+        Run terrain analysis and land use lookup for a tile
+        Returns terrain type, confidence score, description and land use type
+        """
+        point = Point(lon, lat)
         
         # get elevation matrix and calculate slope
-        elevation_matrix = self._get_elevation_matrix(msg.longitude, msg.latitude)
-        cell_size = abs(self.terrain_data.transform[0])
+        elevation_matrix = self._get_elevation_matrix(lon, lat)
         elevation = float(elevation_matrix[1, 1])  # Center point elevation
-        slope = self._calculate_slope(elevation_matrix, cell_size)
+        slope = self._calculate_slope(elevation_matrix, self._cell_size)
         
         # prepare terrain data for classification
         terrain_data = {
             'elevation': elevation,
             'slope': slope,
             'matrix': elevation_matrix,
-            'cell_size': cell_size
+            'cell_size': self._cell_size
         }
         
         # classify terrain
         terrain_type, confidence, description = self._classify_terrain(terrain_data)
         
-        # get land use from vector data
-        land_use = self.land_use_data[self.land_use_data.contains(point)]
-        land_use_type = land_use.iloc[0]['type'] if not land_use.empty else 'unknown'
+        # get land use from vector data; 'within' is evaluated as
+        # point.within(polygon) against index candidates only
+        matches = self._land_use_sindex.query(point, predicate='within')
+        land_use_type = (
+            self.land_use_data.iloc[matches.min()]['type'] if len(matches) else 'unknown'
+        )
+        
+        return terrain_type, confidence, description, land_use_type
+
+    def _update_location(self, msg):
+        """Update location data with terrain analysis"""
+        # terrain and land use are memoized per tile; position, altitude and
+        # heading are refreshed on every fix
+        terrain_type, confidence, description, land_use_type = self._tile_cache(
+            round(msg.latitude, 4),
+            round(msg.longitude, 4)
+        )
         
         with self._lock:
             self.current_data = GeospatialData(
@@ -1,9 +1,9 @@
-from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
 from langchain_community.llms import GemmaCpp
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 import base64
+import re
 import cv2
 import numpy as np
 from collections import Counter
@@ -46,8 +46,20 @@ class GemmaProcessor:
             'group': ['gathering', 'crowd', 'mob', 'gang']
         }
         
-        self.prompt = PromptTemplate(
-            template="""
+        # one case-insensitive alternation per category (substring match)
+        self._weapon_patterns = {
+            category: re.compile('|'.join(map(re.escape, keywords)), re.IGNORECASE)
+            for category, keywords in self.weapon_categories.items()
+        }
+        self._violence_patterns = {
+            category: re.compile('|'.join(map(re.escape, keywords)), re.IGNORECASE)
+            for category, keywords in self.violence_indicators.items()
+        }
+        
+        # render the constant parts once; per event only str.format_map runs.
+        # braces in the JSON format instructions are escaped for format_map
+        format_instructions = self.parser.get_format_instructions()
+        self._prompt_fmt = """
             Analyze the following violent incident detected by drone surveillance:
 
             Location Context:
@@ -64,59 +76,75 @@ class GemmaProcessor:
             and how the terrain/location might affect the situation or response needed.
 
             {format_instructions}
-            """,
-            input_variables=["latitude", "longitude", "terrain_type", "land_use", "detections"],
-            partial_variables={"format_instructions": self.parser.get_format_instructions()}
+            """.replace(
+            "{format_instructions}",
+            format_instructions.replace("{", "{{").replace("}", "}}")
         )
 
-    def _format_detections(self, detections: Dict[str, Any]) -> str:
+    async def analyze_event(self, event_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Analyze a violence event with the LLM without blocking the event loop"""
+        location = event_data['location']
+        
+        prompt = self._prompt_fmt.format_map({
+            "latitude": location['latitude'],
+            "longitude": location['longitude'],
+            "terrain_type": location['terrain_type'],
+            "land_use": location['land_use'],
+            "detections": self._format_detections(
+                event_data['detections'],
+                captured_at=event_data['timestamp']
+            )
+        })
+        
+        response = await self.llm.ainvoke(prompt)
+        analysis = self.parser.parse(response)
+        
+        return analysis.dict()
+
+    def _format_detections(self, detections: Dict[str, Any],
+                           captured_at: Optional[str] = None) -> str:
         """
         Format YOLO detections into detailed text description for LLM analysis
         
-        Expected detection format:
+        Expected detection format (one column per field, N detections):
         {
-            'objects': [
-                {
-                    'class_name': str,
-                    'confidence': float,
-                    'bbox': [x1, y1, x2, y2]
-                },
-                ...
-            ],
+            'bbox': np.ndarray,        # (N, 4) [x1, y1, x2, y2]
+            'confidence': np.ndarray,  # (N,)
+            'class_id': np.ndarray,    # (N,)
+            'class_name': List[str],   # N names
             'frame_info': {
                 'width': int,
                 'height': int,
-                'timestamp': float
+                'timestamp': float  # capture time, epoch seconds
             }
         }
         """
-        if not detections or 'objects' not in detections:
+        if not detections or 'class_name' not in detections:
             return "No clear detections available"
 
+        class_names = detections['class_name']
+        
         # count detected objects
-        object_counts = Counter(obj['class_name'] for obj in detections['objects'])
+        object_counts = Counter(class_names)
         
         # process people and their actions
         people_info = []
         weapon_info = []
         action_info = []
         
-        for obj in detections['objects']:
-            class_name = obj['class_name']
-            conf = obj['confidence']
-            
+        for class_name, conf in zip(class_names, detections['confidence'].tolist()):
             # process weapons
             weapon_type = None
-            for category, keywords in self.weapon_categories.items():
-                if any(keyword in class_name.lower() for keyword in keywords):
+            for category, pattern in self._weapon_patterns.items():
+                if pattern.search(class_name):
                     weapon_type = category
                     weapon_info.append(f"{class_name} (type: {category}, confidence: {conf:.2f})")
                     break
             
             # process violent actions
             action_type = None
-            for category, keywords in self.violence_indicators.items():
-                if any(keyword in class_name.lower() for keyword in keywords):
+            for category, pattern in self._violence_patterns.items():
+                if pattern.search(class_name):
                     action_type = category
                     action_info.append(f"{class_name} (type: {category}, confidence: {conf:.2f})")
                     break
@@ -143,8 +171,10 @@ class GemmaProcessor:
             description_parts.extend(f"- {info}" for info in action_info)
         
         # spatial analysis
-        if len(detections['objects']) >= 2:
-            description_parts.append(self._analyze_spatial_relationships(detections['objects']))
+        if len(class_names) >= 2:
+            description_parts.append(
+                self._analyze_spatial_relationships(class_names, detections['bbox'])
+            )
         
         # join
         detailed_description = "\n".join(description_parts)
@@ -155,34 +185,32 @@ class GemmaProcessor:
         {detailed_description}
         
         Additional Context:
-        - Scene captured at: {detections.get('frame_info', {}).get('timestamp', 'unknown time')}
+        - Scene captured at: {captured_at or 'unknown time'}
         - Detection confidence levels are provided where available
         """
 
-    def _analyze_spatial_relationships(self, objects: List[Dict]) -> str:
+    def _analyze_spatial_relationships(self, class_names: List[str],
+                                       bboxes: np.ndarray) -> str:
         """Analyze spatial relationships between detected objects"""
-        # find people who are close to each other or to weapons
-        relationships = []
-        
-        for i, obj1 in enumerate(objects):
-            for obj2 in objects[i+1:]:
-                # calculate distance between bounding boxes
-                distance = self._calculate_box_distance(obj1['bbox'], obj2['bbox'])
-                
-                if distance < 0.2:  # threshold for "close" objects (20% of frame size)
-                    relationships.append(
-                        f"Detected {obj1['class_name']} is in close proximity to {obj2['class_name']}"
-                    )
+        distances = self._calculate_box_distances(bboxes.astype(np.float32))
+        
+        # find people who are close to each other or to weapons;
+        # threshold for "close" objects (20% of frame size), each pair once
+        close_i, close_j = np.nonzero(np.triu(distances < 0.2, k=1))
+        relationships = [
+            f"Detected {class_names[i]} is in close proximity to {class_names[j]}"
+            for i, j in zip(close_i, close_j)
+        ]
         
         if relationships:
             return "Spatial Analysis:\n- " + "\n- ".join(relationships)
         return "No significant spatial relationships detected between objects"
 
-    def _calculate_box_distance(self, bbox1: List[float], bbox2: List[float]) -> float:
-        """Calculate normalized distance between two bounding boxes"""
-        # calculate centers
-        center1 = [(bbox1[0] + bbox1[2])/2, (bbox1[1] + bbox1[3])/2]
-        center2 = [(bbox2[0] + bbox2[2])/2, (bbox2[1] + bbox2[3])/2]
-        
-        # calculate Euclidean distance (normalized)
-        return np.sqrt((center1[0] - center2[0])**2 + (center1[1] - center2[1])**2)
\ No newline at end of file
+    def _calculate_box_distances(self, bboxes: np.ndarray) -> np.ndarray:
+        """Calculate pairwise distances between bounding box centers"""
+        # calculate centers of the (N, 4) [x1, y1, x2, y2] boxes
+        centers = 0.5 * (bboxes[:, :2] + bboxes[:, 2:])
+        
+        # calculate (N, N) Euclidean distance matrix via broadcasting
+        diff = centers[:, None, :] - centers[None, :, :]
+        return np.sqrt((diff * diff).sum(axis=-1))
\ No newline at end of file
@@ -1,12 +1,21 @@
+import os
+
+# align OpenMP/MKL pools with VideoProcessor's torch intra-op setting; must be
+# set before torch is imported
+_worker_threads = str(max(1, (os.cpu_count() or 1) - 1))
+os.environ.setdefault('OMP_NUM_THREADS', _worker_threads)
+os.environ.setdefault('MKL_NUM_THREADS', _worker_threads)
+
 import asyncio
-from datetime import datetime
+import time
 import numpy as np
-from typing import Dict, Any
+from collections import Counter
+from typing import Dict, Any, Optional
 from dataclasses import dataclass
 import logging
 from pathlib import Path
 
-from video_processor import VideoProcessor
+from video_processor import VideoProcessor, ProcessedFrame
 from geospatial import GeospatialModule
 from llm_processor import GemmaProcessor
 from data_transmitter import DataTransmitter
@@ -19,6 +28,9 @@ class DroneConfig:
     video_source: int = 0
     gps_port: str = '/dev/ttyUSB0'
     update_interval: float = 0.1
+    llm_min_interval: float = 5.0  # seconds between LLM analyses
+    llm_bypass_score: float = 0.9  # violence score that skips the rate limit
+    analysis_cache_ttl: float = 30.0  # seconds a cached LLM analysis stays valid
 
 class DroneController:
     def __init__(self, config: DroneConfig):
@@ -37,6 +49,15 @@ class DroneController:
         )
         self.running = False
         self.logger = logging.getLogger(__name__)
+        
+        # LLM gating state: last analysed event time and scene
+        self._last_event_ts = 0.0
+        self._last_fingerprint = None
+        self._last_analysis = None
+        self._last_analysis_ts = 0.0
+        
+        # at most one violence event (LLM + upload) in flight at a time
+        self._event_task: Optional[asyncio.Task] = None
 
     async def start(self):
         """Start drone surveillance system"""
@@ -50,25 +71,59 @@ class DroneController:
                 await asyncio.sleep(self.config.update_interval)
         except Exception as e:
             self.logger.error(f"Error in drone controller: {e}")
-            self.stop()
+        finally:
+            if self.running:
+                self.stop()
+            await self.shutdown()
 
     async def process_frame(self):
         """Process a single frame and associated data"""
-        frame_data = self.video_processor.get_latest_frame()
+        frame_data = self.video_processor.get_latest_result()
         if frame_data is None:
             return
 
         if frame_data.violence_detected:
+            # analysis runs in the background so frames keep draining; events
+            # raised while one is still pending are dropped
+            if self._event_task is None or self._event_task.done():
+                self._event_task = asyncio.create_task(
+                    self._run_violence_event(frame_data)
+                )
+
+    async def _run_violence_event(self, frame_data: ProcessedFrame):
+        """Run process_violence_event as a background task, logging failures"""
+        try:
             await self.process_violence_event(frame_data)
+        except Exception as e:
+            self.logger.error(f"Error processing violence event: {e}")
 
-    async def process_violence_event(self, frame_data: Dict[str, Any]):
+    async def process_violence_event(self, frame_data: ProcessedFrame):
         """Process and transmit a violence event"""
+        # rate-limit LLM-backed events unless the signal is strong
+        now = time.monotonic()
+        if (now - self._last_event_ts < self.config.llm_min_interval and
+                frame_data.violence_score < self.config.llm_bypass_score):
+            return
+        
         geo_data = self.geo_module.get_current_data()
+        captured_at = self.video_processor.to_datetime(frame_data.timestamp)
         
         event_data = {
-            'timestamp': datetime.now().isoformat(),
-            'frame': frame_data.frame,
-            'detections': frame_data.detections,
+            'timestamp': captured_at.isoformat(),
+            # JPEG bytes, encoded once off the event loop; the raw ndarray
+            # never reaches the serializer
+            'frame_jpeg': await asyncio.to_thread(
+                self.data_transmitter.encode_frame, frame_data.frame
+            ),
+            # frame_info carries the drone's monotonic capture clock; the
+            # payload gets wall-clock epoch seconds instead
+            'detections': {
+                **frame_data.detections,
+                'frame_info': {
+                    **frame_data.detections['frame_info'],
+                    'timestamp': captured_at.timestamp()
+                }
+            },
             'location': {
                 'latitude': geo_data.latitude,
                 'longitude': geo_data.longitude,
@@ -79,17 +134,46 @@ class DroneController:
             }
         }
 
-        analysis = await self.llm_processor.analyze_event(event_data)
-        event_data['analysis'] = analysis
+        # reuse a recent analysis when the same classes/counts are in view
+        # at the same place
+        fingerprint = self._scene_fingerprint(frame_data.detections, geo_data)
+        if (fingerprint != self._last_fingerprint or self._last_analysis is None or
+                now - self._last_analysis_ts >= self.config.analysis_cache_ttl):
+            self._last_analysis = await self.llm_processor.analyze_event(event_data)
+            self._last_fingerprint = fingerprint
+            self._last_analysis_ts = now
+        self._last_event_ts = now
+        event_data['analysis'] = self._last_analysis
 
         await self.data_transmitter.send_event(event_data)
 
+    def _scene_fingerprint(self, detections: Dict[str, Any], geo_data) -> tuple:
+        """Hashable summary of the ~100 m tile and terrain plus which classes
+        are in view and how many of each"""
+        return (
+            round(geo_data.latitude, 3),
+            round(geo_data.longitude, 3),
+            geo_data.terrain_type,
+            geo_data.land_use,
+            frozenset(Counter(detections['class_id'].tolist()).items())
+        )
+
     def stop(self):
         """Stop all drone systems"""
         self.running = False
         self.video_processor.stop()
         self.geo_module.stop()
 
+    async def shutdown(self):
+        """Cancel a pending violence event and close the shared HTTP session"""
+        if self._event_task is not None and not self._event_task.done():
+            self._event_task.cancel()
+            try:
+                await self._event_task
+            except asyncio.CancelledError:
+                pass
+        await self.data_transmitter.close()
+
 if __name__ == "__main__":
     config = DroneConfig(
         yolo_model_path=Path("models/yolo_model.pt"),
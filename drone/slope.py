@@ -0,0 +1,33 @@
+# drone/slope.py
+import math
+import numpy as np
+from numba import njit
+
+@njit(fastmath=True, cache=True)
+def slope_kernel(elevation_matrix: np.ndarray, cell_size: float) -> float:
+    """
+    Mean slope in degrees over the matrix in a single pass
+    Uses the same differences as np.gradient (central inside, one-sided at edges)
+    """
+    rows, cols = elevation_matrix.shape
+    total = 0.0
+    
+    for i in range(rows):
+        for j in range(cols):
+            if i == 0:
+                dy = (elevation_matrix[1, j] - elevation_matrix[0, j]) / cell_size
+            elif i == rows - 1:
+                dy = (elevation_matrix[i, j] - elevation_matrix[i - 1, j]) / cell_size
+            else:
+                dy = (elevation_matrix[i + 1, j] - elevation_matrix[i - 1, j]) / (2 * cell_size)
+            
+            if j == 0:
+                dx = (elevation_matrix[i, 1] - elevation_matrix[i, 0]) / cell_size
+            elif j == cols - 1:
+                dx = (elevation_matrix[i, j] - elevation_matrix[i, j - 1]) / cell_size
+            else:
+                dx = (elevation_matrix[i, j + 1] - elevation_matrix[i, j - 1]) / (2 * cell_size)
+            
+            total += math.atan(math.sqrt(dx * dx + dy * dy))
+    
+    return math.degrees(total / (rows * cols))
@@ -1,37 +1,87 @@
 # drone/video_processor.py
+import os
 import cv2
 import torch
+import torch.nn.functional as F
 import numpy as np
 from PIL import Image
 import threading
-from queue import Queue
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Optional, Dict, Any, Tuple
 import time
+from datetime import datetime, timezone
 from dataclasses import dataclass
 import logging
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ProcessedFrame:
     frame: np.ndarray
     detections: Dict[str, Any]
-    timestamp: float
+    timestamp: int  # time.monotonic_ns() at capture
     violence_detected: bool
+    violence_score: float  # sum of violence cues, used to prioritise LLM analysis
 
 class VideoProcessor:
-    def __init__(self, model_path: str, device: str = 'cpu', 
+    def __init__(self, model_path: str, device: Optional[str] = None, 
                  confidence_threshold: float = 0.5,
-                 violence_threshold: float = 0.7):
-        self.model = torch.jit.load(model_path)
-        self.model.to(device)
+                 violence_threshold: float = 0.7,
+                 motion_threshold: float = 0.01):
+        if device is None:
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        
+        # leave one core to the capture/GPS/asyncio threads; a single
+        # sequential model gains nothing from inter-op parallelism
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) - 1))
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # already fixed by an earlier instance or parallel work
+        
+        self.model = torch.jit.load(model_path, map_location=device).eval()
         self.device = device
+        
+        # FP16 halves weight/activation traffic on GPU; CPU kernels stay FP32
+        self.dtype = torch.float16 if device.startswith('cuda') else torch.float32
+        self.model.to(self.dtype)
+        
+        # freeze weights into the graph and fold conv/bn so each call skips
+        # attribute lookups and training-only ops
+        self.model = torch.jit.optimize_for_inference(self.model)
+        self.input_size = (640, 640)
+        
+        # reusable preprocessing buffers, filled in place for every frame
+        width, height = self.input_size
+        self._resize_buf = np.empty((height, width, 3), dtype=np.uint8)
+        self._rgb_buf = np.empty((height, width, 3), dtype=np.uint8)
+        self._input_tensor = torch.empty((1, 3, height, width), dtype=self.dtype, device=device)
+        self._pinned_frame = None  # page-locked staging buffer for async uploads
+        
+        # warm up once so lazy kernel/allocator init is not paid on the first frame
+        with torch.inference_mode():
+            self.model(self._input_tensor.zero_())
+
         self.confidence_threshold = confidence_threshold
         self.violence_threshold = violence_threshold
         
-        self.frame_queue = Queue(maxsize=10)
-        self.result_queue = Queue(maxsize=10)
+        # background model for the motion gate; fraction of changed pixels
+        # required before a frame is sent to YOLO
+        self.bg_subtractor = cv2.createBackgroundSubtractorMOG2(detectShadows=False)
+        self.motion_threshold = motion_threshold
+        
+        # single-slot handoffs: only the newest frame/result matters, so
+        # producers overwrite instead of queueing stale items
+        self._latest_frame = None
+        self._frame_lock = threading.Lock()
+        self._frame_wanted = threading.Event()
+        self._frame_ready = threading.Event()
+        self._latest_result = None
+        self._result_lock = threading.Lock()
         self.running = False
         self.logger = logging.getLogger(__name__)
         
+        # reference pair for mapping monotonic frame timestamps to wall time
+        self._wall_t0_ns = time.time_ns()
+        self._mono_t0_ns = time.monotonic_ns()
+        
         # define class mappings for your violence detection model
         self.classes = {
             0: 'person',
@@ -47,14 +97,27 @@ class VideoProcessor:
         }
         
         # define violence-related classes
-        self.violence_classes = {1, 2, 3, 7, 9}  
-        self.weapon_classes = {4, 5, 6}         
+        self.person_class_id = 0
+        self.violence_classes = frozenset({1, 2, 3, 7, 9})
+        self.weapon_classes = frozenset({4, 5, 6})
+        
+        # array forms of the class sets for np.isin over detection columns
+        self._violence_ids = np.fromiter(self.violence_classes, dtype=np.int32)
+        self._weapon_ids = np.fromiter(self.weapon_classes, dtype=np.int32)
 
     def start(self, video_source=0):
         """Start video processing"""
         self.running = True
-        self.capture = cv2.VideoCapture(video_source)
-        
+        if isinstance(video_source, str):
+            # files and RTSP streams go through FFmpeg, which can hand decode to
+            # NVDEC/VAAPI/etc. and falls back to software when none is present
+            self.capture = cv2.VideoCapture(
+                video_source,
+                cv2.CAP_FFMPEG,
+                [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+            )
+        else:
+            self.capture = cv2.VideoCapture(video_source)
 
         self.capture_thread = threading.Thread(target=self._capture_frames)
         self.process_thread = threading.Thread(target=self._process_frames)
@@ -62,73 +125,110 @@ class VideoProcessor:
         self.capture_thread.start()
         self.process_thread.start()
         
+        # pin capture to one core and inference to the rest (Linux only)
+        if hasattr(os, 'sched_setaffinity'):
+            cores = sorted(os.sched_getaffinity(0))
+            if len(cores) > 1:
+                os.sched_setaffinity(self.capture_thread.native_id, {cores[0]})
+                os.sched_setaffinity(self.process_thread.native_id, set(cores[1:]))
+        
         self.logger.info("Video processor started")
 
     def _capture_frames(self):
         """Continuously capture frames from the video source"""
         while self.running:
-            ret, frame = self.capture.read()
-            if not ret:
+            # grab() only demuxes; a frame is decoded by retrieve() only when
+            # the processing thread is waiting for one
+            if not self.capture.grab():
                 self.logger.warning("Failed to capture frame")
                 continue
-                
-            if not self.frame_queue.full():
-                self.frame_queue.put((frame, time.time()))
-            else:
-                self.logger.debug("Frame queue full, skipping frame")
-            
-            time.sleep(0.01)  # prevent excessive CPU usage
+
+            if self._frame_wanted.is_set():
+                ret, frame = self.capture.retrieve()
+                if ret:
+                    with self._frame_lock:
+                        self._latest_frame = (frame, time.monotonic_ns())
+                    self._frame_wanted.clear()
+                    self._frame_ready.set()
 
     def _process_frames(self):
         """Process frames with YOLO model"""
         while self.running:
-            if self.frame_queue.empty():
-                time.sleep(0.01)
+            self._frame_wanted.set()
+            if not self._frame_ready.wait(timeout=0.1):
                 continue
+            self._frame_ready.clear()
             
-            frame, timestamp = self.frame_queue.get()
+            with self._frame_lock:
+                frame, timestamp = self._latest_frame
             
             try:
+                if not self._has_motion(frame):
+                    continue
+                
                 input_tensor = self._preprocess_frame(frame)
                 
-                with torch.no_grad():
+                with torch.inference_mode():
                     predictions = self.model(input_tensor)
                 
-                detections = self._process_predictions(predictions, frame)
+                detections = self._process_predictions(predictions, frame, timestamp)
                 
-                violence_detected = self._analyze_violence(detections)
+                violence_detected, violence_score = self._analyze_violence(detections)
                 
                 result = ProcessedFrame(
                     frame=frame,
                     detections=detections,
                     timestamp=timestamp,
-                    violence_detected=violence_detected
+                    violence_detected=violence_detected,
+                    violence_score=violence_score
                 )
                 
-                if not self.result_queue.full():
-                    self.result_queue.put(result)
+                with self._result_lock:
+                    self._latest_result = result
                 
             except Exception as e:
                 self.logger.error(f"Error processing frame: {e}")
                 continue
 
+    def _has_motion(self, frame: np.ndarray) -> bool:
+        """Check a downscaled frame for motion against the background model"""
+        mask = self.bg_subtractor.apply(cv2.resize(frame, (160, 120)))
+        return cv2.countNonZero(mask) > self.motion_threshold * mask.size
+
     def _preprocess_frame(self, frame: np.ndarray) -> torch.Tensor:
         """Preprocess frame for YOLO model"""
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        if self.device.startswith('cuda'):
+            return self._preprocess_frame_cuda(frame)
+        
+        # resize first so the colour conversion only touches model-sized pixels
+        cv2.resize(frame, self.input_size, dst=self._resize_buf)
+        cv2.cvtColor(self._resize_buf, cv2.COLOR_BGR2RGB, dst=self._rgb_buf)
+        
+        # HWC to CHW, cast and move to device in one copy, then normalize to [0,1]
+        self._input_tensor[0].copy_(torch.from_numpy(self._rgb_buf).permute(2, 0, 1))
+        self._input_tensor.div_(255.0)
         
-        input_size = (640, 640)  
-        image = cv2.resize(image, input_size)
-        image = image.transpose(2, 0, 1)  # HWC to CHW
-        image = torch.from_numpy(image).float()
-        image /= 255.0  # Normalize to [0,1]
+        return self._input_tensor
+
+    def _preprocess_frame_cuda(self, frame: np.ndarray) -> torch.Tensor:
+        """Upload the raw uint8 frame and resize/convert/normalize on the GPU"""
+        if self._pinned_frame is None or self._pinned_frame.shape != frame.shape:
+            self._pinned_frame = torch.empty(frame.shape, dtype=torch.uint8, pin_memory=True)
+        self._pinned_frame.copy_(torch.from_numpy(frame))
+        
+        # async host-to-device copy of the uint8 frame (a quarter of float32 bytes)
+        image = self._pinned_frame.to(self.device, non_blocking=True)
+        image = image.permute(2, 0, 1).unsqueeze(0).to(self.dtype)  # HWC to NCHW
         
-        image = image.unsqueeze(0)
-        image = image.to(self.device)
+        width, height = self.input_size
+        image = F.interpolate(image, size=(height, width), mode='bilinear', align_corners=False)
         
-        return image
+        # BGR to RGB, normalize to [0,1]
+        return image[:, [2, 1, 0]].div_(255.0)
 
     def _process_predictions(self, predictions: torch.Tensor, 
-                           original_frame: np.ndarray) -> Dict[str, Any]:
+                           original_frame: np.ndarray,
+                           timestamp: int) -> Dict[str, Any]:
         """Process YOLO predictions into structured format"""
         height, width = original_frame.shape[:2]
         
@@ -136,89 +236,75 @@ class VideoProcessor:
         
         confident_preds = predictions[predictions[:, 4] > self.confidence_threshold]
         
-        objects = []
-        for pred in confident_preds:
-            x1, y1, x2, y2, conf, class_id = pred[:6]
-            
-            # convert to original frame coordinates
-            x1 = int(x1 * width)
-            y1 = int(y1 * height)
-            x2 = int(x2 * width)
-            y2 = int(y2 * height)
-            
-            class_id = int(class_id)
-            class_name = self.classes.get(class_id, 'unknown')
-            
-            objects.append({
-                'class_name': class_name,
-                'confidence': float(conf),
-                'bbox': [x1, y1, x2, y2],
-                'class_id': class_id
-            })
+        # convert to original frame coordinates in one broadcast
+        scale = np.array([width, height, width, height], dtype=np.float32)
+        bboxes = (confident_preds[:, :4] * scale).astype(np.int32)
+        confidences = confident_preds[:, 4].astype(np.float32)
+        class_ids = confident_preds[:, 5].astype(np.int32)
         
+        # detections are stored column-wise (one array per field)
         return {
-            'objects': objects,
+            'bbox': bboxes,
+            'confidence': confidences,
+            'class_id': class_ids,
+            'class_name': [self.classes.get(c, 'unknown') for c in class_ids.tolist()],
             'frame_info': {
                 'width': width,
                 'height': height,
-                'timestamp': time.time()
+                'timestamp': timestamp
             }
         }
 
-    def _analyze_violence(self, detections: Dict[str, Any]) -> bool:
-        """Analyze detections for signs of violence"""
-        if not detections['objects']:
-            return False
+    def _analyze_violence(self, detections: Dict[str, Any]) -> Tuple[bool, float]:
+        """
+        Analyze detections for signs of violence
+        Returns whether violence was detected and the summed violence score
+        """
+        class_ids = detections['class_id']
+        if len(class_ids) == 0:
+            return False, 0.0
 
-        violence_scores = []
-        has_weapons = False
+        # violence and weapon detections contribute their confidence
+        weapon_mask = np.isin(class_ids, self._weapon_ids)
+        scored_mask = np.isin(class_ids, self._violence_ids) | weapon_mask
+        scores = detections['confidence'][scored_mask]
+        score = float(scores.sum())
         
-        for obj in detections['objects']:
-            class_id = obj['class_id']
-            confidence = obj['confidence']
-            
-            if class_id in self.violence_classes:
-                violence_scores.append(confidence)
-            
-            if class_id in self.weapon_classes:
-                has_weapons = True
-                violence_scores.append(confidence)
-            
-            if obj['class_name'] == 'person':
-                for other_obj in detections['objects']:
-                    if (other_obj['class_name'] == 'person' and 
-                        other_obj != obj):
-                        distance = self._calculate_box_distance(
-                            obj['bbox'],
-                            other_obj['bbox']
-                        )
-                        if distance < 0.2:  # Close proximity threshold
-                            violence_scores.append(0.6)  # Base suspicion score
+        # a weapon or a confident violence class decides the frame on its own,
+        # so the pairwise person check only runs when neither is present
+        if weapon_mask.any() or (scores > self.violence_threshold).any():
+            return True, score
         
-        if violence_scores:
-            max_score = max(violence_scores)
-            return max_score > self.violence_threshold or has_weapons
+        person_bboxes = detections['bbox'][class_ids == self.person_class_id]
+        if len(person_bboxes) >= 2:
+            distances = self._calculate_box_distances(person_bboxes.astype(np.float32))
+            np.fill_diagonal(distances, np.inf)
+            if (distances < 0.2).any():  # Close proximity threshold
+                proximity_score = 0.6  # Base suspicion score
+                return proximity_score > self.violence_threshold, score + proximity_score
         
-        return False
+        return False, score
 
-    def _calculate_box_distance(self, bbox1: List[float], bbox2: List[float]) -> float:
-        """Calculate normalized distance between two bounding boxes"""
-        center1 = [(bbox1[0] + bbox1[2])/2, (bbox1[1] + bbox1[3])/2]
-        center2 = [(bbox2[0] + bbox2[2])/2, (bbox2[1] + bbox2[3])/2]
+    def _calculate_box_distances(self, bboxes: np.ndarray) -> np.ndarray:
+        """Calculate pairwise center distances, row-normalized by each box's diagonal"""
+        centers = 0.5 * (bboxes[:, :2] + bboxes[:, 2:])
+        sizes = np.abs(bboxes[:, 2:] - bboxes[:, :2])
+        diagonals = np.sqrt((sizes * sizes).sum(axis=-1))
         
-        frame_width = abs(bbox1[2] - bbox1[0])
-        frame_height = abs(bbox1[3] - bbox1[1])
-        
-        distance = np.sqrt((center1[0] - center2[0])**2 + (center1[1] - center2[1])**2)
-        normalized_distance = distance / np.sqrt(frame_width**2 + frame_height**2)
-        
-        return normalized_distance
+        diff = centers[:, None, :] - centers[None, :, :]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.sqrt((diff * diff).sum(axis=-1)) / diagonals[:, None]
+
+    def to_datetime(self, timestamp: int) -> datetime:
+        """Convert a monotonic frame timestamp to a UTC datetime"""
+        wall_ns = self._wall_t0_ns + (timestamp - self._mono_t0_ns)
+        return datetime.fromtimestamp(wall_ns / 1e9, tz=timezone.utc)
 
     def get_latest_result(self) -> Optional[ProcessedFrame]:
         """Get the latest processed frame result"""
-        if self.result_queue.empty():
-            return None
-        return self.result_queue.get()
+        with self._result_lock:
+            result, self._latest_result = self._latest_result, None
+        return result
 
     def stop(self):
         """Stop video processing"""
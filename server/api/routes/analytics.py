@@ -1,108 +1,195 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Dict, Any
+import asyncio
+import logging
+import time
+from cachetools import TTLCache
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
-from geoalchemy2.functions import ST_Distance, ST_AsGeoJSON
 import json
 
-from ...database import get_db
-from ...models import Event, EventAnalytics
+from ...database import get_db, SessionLocal
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# seconds between refreshes of the analytics_summary_hourly rollup
+SUMMARY_REFRESH_INTERVAL = 120
+
+# dashboard polls within the same minute share one computed response;
+# keys carry the minute so entries never outlive it
+_response_cache = TTLCache(maxsize=256, ttl=60)
+
+# background rollup refresh; a reference is kept so the task isn't collected
+_refresh_task: Optional[asyncio.Task] = None
+
+# per-risk-level partial aggregates over [:t0, now): whole hours the rollup
+# has settled come from analytics_summary_hourly, the partial first hour and
+# the recent tail from the raw tables, so totals match the exact window.
+# Late-arriving events older than the tail appear after the next refresh
+_WINDOW_PARTS_SQL = """
+    SELECT risk_level, cnt, sum_sev, cnt_sev, sum_rt, cnt_rt, min_rt, max_rt
+    FROM analytics_summary_hourly
+    WHERE bucket >= :rollup_from AND bucket < :rollup_to
+    UNION ALL
+    SELECT e.risk_level,
+           COUNT(*),
+           SUM(a.severity_score),
+           COUNT(a.severity_score),
+           SUM(a.response_time),
+           COUNT(a.response_time),
+           MIN(a.response_time),
+           MAX(a.response_time)
+    FROM events e
+    JOIN event_analytics a ON a.event_id = e.id
+    WHERE e.timestamp >= :t0
+      AND (e.timestamp < :rollup_from OR e.timestamp >= :rollup_to)
+    GROUP BY e.risk_level
+"""
+
+def _window_params(time_threshold: datetime) -> Dict[str, datetime]:
+    """Bind parameters for _WINDOW_PARTS_SQL"""
+    hour = timedelta(hours=1)
+    
+    # first whole hour inside the window
+    rollup_from = time_threshold.replace(minute=0, second=0, microsecond=0)
+    if rollup_from < time_threshold:
+        rollup_from += hour
+    
+    # hours that closed at least two refreshes ago are complete in the rollup
+    settled = datetime.utcnow() - timedelta(seconds=2 * SUMMARY_REFRESH_INTERVAL)
+    rollup_to = settled.replace(minute=0, second=0, microsecond=0)
+    
+    # an empty rollup range leaves the whole window to the raw tables
+    return {"t0": time_threshold, "rollup_from": rollup_from, "rollup_to": rollup_to}
 
 @router.get("/analytics/summary")
 async def get_analytics_summary(
     time_range: int = 24,  # hours
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Dict[str, Any]:
     """Get summary analytics for specified time range"""
+    key = ('summary', time_range, int(time.time() // 60))
+    if key in _response_cache:
+        return _response_cache[key]
+    
     time_threshold = datetime.utcnow() - timedelta(hours=time_range)
     
-    # get basic statistics
-    stats = db.query(
-        func.count(Event.id).label('total_events'),
-        func.avg(EventAnalytics.severity_score).label('avg_severity'),
-        func.avg(EventAnalytics.response_time).label('avg_response_time')
-    ).join(EventAnalytics).filter(Event.timestamp >= time_threshold).first()
-    
-    # get risk level distribution
-    risk_distribution = db.query(
-        Event.risk_level,
-        func.count(Event.id).label('count')
-    ).filter(
-        Event.timestamp >= time_threshold
-    ).group_by(Event.risk_level).all()
-    
-    # get weapon type distribution
-    weapon_stats = db.query(
-        Event.weapon_types,
-        func.count(Event.id).label('count')
-    ).filter(
-        Event.timestamp >= time_threshold,
-        Event.weapons_present == True
-    ).group_by(Event.weapon_types).all()
-    
-    return {
-        "total_events": stats.total_events,
-        "average_severity": float(stats.avg_severity) if stats.avg_severity else 0,
-        "average_response_time": float(stats.avg_response_time) if stats.avg_response_time else 0,
+    # counts and sums come mostly from the hourly rollup, one row per
+    # hour/risk level; SUM(bigint) is numeric in postgres, so counts are cast
+    # back to bigint
+    rollup = (await db.execute(text(f"""
+        SELECT risk_level,
+               SUM(cnt)::bigint AS cnt,
+               SUM(sum_sev) AS sum_sev,
+               SUM(cnt_sev)::bigint AS cnt_sev,
+               SUM(sum_rt) AS sum_rt,
+               SUM(cnt_rt)::bigint AS cnt_rt
+        FROM ({_WINDOW_PARTS_SQL}) parts
+        GROUP BY risk_level
+    """), _window_params(time_threshold))).all()
+    
+    sum_sev = sum(float(r.sum_sev or 0) for r in rollup)
+    cnt_sev = sum(r.cnt_sev for r in rollup)
+    sum_rt = sum(float(r.sum_rt or 0) for r in rollup)
+    cnt_rt = sum(r.cnt_rt for r in rollup)
+    
+    # get weapon type distribution, counted per individual weapon type
+    weapon_stats = (await db.execute(text("""
+        SELECT w.weapon_type, COUNT(*) AS count
+        FROM events e,
+             LATERAL jsonb_array_elements_text(e.weapon_types) AS w(weapon_type)
+        WHERE e.timestamp >= :t0
+          AND e.weapons_present
+          AND jsonb_typeof(e.weapon_types) = 'array'
+        GROUP BY w.weapon_type
+    """), {"t0": time_threshold})).all()
+    
+    result = {
+        "total_events": int(sum(r.cnt for r in rollup)),
+        "average_severity": sum_sev / cnt_sev if cnt_sev else 0,
+        "average_response_time": sum_rt / cnt_rt if cnt_rt else 0,
         "risk_distribution": {
-            level.risk_level: level.count for level in risk_distribution
+            level.risk_level: int(level.cnt) for level in rollup
         },
         "weapon_statistics": {
-            json.dumps(stat.weapon_types): stat.count for stat in weapon_stats
+            stat.weapon_type: stat.count for stat in weapon_stats
         }
     }
+    
+    _response_cache[key] = result
+    return result
 
 @router.get("/analytics/hotspots")
 async def get_hotspots(
     min_events: int = 3,
     radius_meters: float = 1000,
     time_range: int = 24,  # hours
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get event hotspots based on spatial clustering"""
     time_threshold = datetime.utcnow() - timedelta(hours=time_range)
     
-    # find clusters of events
-    clusters = db.query(
-        Event.location,
-        func.count(Event.id).label('event_count'),
-        func.avg(EventAnalytics.severity_score).label('avg_severity')
-    ).join(EventAnalytics).filter(
-        Event.timestamp >= time_threshold
-    ).group_by(
-        Event.location
-    ).having(
-        func.count(Event.id) >= min_events
-    ).all()
-    
-    # process clusters
-    hotspots = []
-    for cluster in clusters:
-        nearby_events = db.query(Event).filter(
-            func.ST_DWithin(
-                Event.location,
-                cluster.location,
-                radius_meters
-            ),
-            Event.timestamp >= time_threshold
-        ).all()
-        
-        if len(nearby_events) >= min_events:
-            hotspots.append({
-                "location": json.loads(db.scalar(ST_AsGeoJSON(cluster.location))),
-                "event_count": cluster.event_count,
-                "average_severity": float(cluster.avg_severity),
-                "recent_events": [
-                    {
-                        "id": event.id,
-                        "timestamp": event.timestamp,
-                        "risk_level": event.risk_level
-                    } for event in nearby_events[:5]  # Last 5 events
-                ]
-            })
+    # density clustering in one pass on web mercator (ST_ClusterDBSCAN works
+    # on geometry only). Mercator units stretch by 1/cos(lat), so eps is the
+    # radius scaled at the window's mean latitude. Unclustered events get NULL
+    clusters = (await db.execute(text("""
+        WITH windowed AS (
+            SELECT e.id, e.timestamp, e.risk_level, e.location, a.severity_score
+            FROM events e
+            JOIN event_analytics a ON a.event_id = e.id
+            WHERE e.timestamp >= :t0
+        ), scale AS (
+            SELECT cos(radians(AVG(ST_Y(location)))) AS k
+            FROM windowed
+        ), clustered AS (
+            SELECT w.*,
+                   ST_ClusterDBSCAN(
+                       ST_Transform(w.location, 3857),
+                       eps := :radius_meters / scale.k,
+                       minpoints := :min_events
+                   ) OVER () AS cid
+            FROM windowed w
+            CROSS JOIN scale
+        ), clusters AS (
+            SELECT cid,
+                   ST_AsGeoJSON(ST_Centroid(ST_Collect(location))) AS loc_json,
+                   COUNT(*) AS event_count,
+                   AVG(severity_score) AS avg_severity
+            FROM clustered
+            WHERE cid IS NOT NULL
+            GROUP BY cid
+            HAVING COUNT(*) >= :min_events
+        )
+        SELECT cl.loc_json, cl.event_count, cl.avg_severity, recent.recent_events
+        FROM clusters cl
+        CROSS JOIN LATERAL (
+            -- only the newest 5 members of each cluster are read and returned
+            SELECT jsonb_agg(
+                       jsonb_build_object('id', r.id, 'timestamp', r.timestamp, 'risk_level', r.risk_level)
+                       ORDER BY r.timestamp DESC
+                   ) AS recent_events
+            FROM (
+                SELECT id, timestamp, risk_level
+                FROM clustered c
+                WHERE c.cid = cl.cid
+                ORDER BY timestamp DESC
+                LIMIT 5
+            ) r
+        ) recent
+    """), {
+        "t0": time_threshold,
+        "radius_meters": radius_meters,
+        "min_events": min_events
+    })).all()
+    
+    hotspots = [{
+        "location": json.loads(cluster.loc_json),
+        "event_count": cluster.event_count,
+        "average_severity": float(cluster.avg_severity) if cluster.avg_severity else 0,
+        "recent_events": json.loads(cluster.recent_events)  # Last 5 events, newest first
+    } for cluster in clusters]
     
     return hotspots
 
@@ -110,75 +197,85 @@ async def get_hotspots(
 async def get_trends(
     time_range: int = 24,  # hours
     interval_minutes: int = 60,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get event trends over time"""
-    time_threshold = datetime.utcnow() - timedelta(hours=time_range)
+    key = ('trends', time_range, interval_minutes, int(time.time() // 60))
+    if key in _response_cache:
+        return _response_cache[key]
+    
+    now = datetime.utcnow()
+    time_threshold = now - timedelta(hours=time_range)
+    step = timedelta(minutes=interval_minutes)
+    
+    # bucket all intervals in one scan; generate_series keeps empty buckets
+    rows = (await db.execute(text("""
+        SELECT gs.bucket AS start_time,
+               gs.bucket + CAST(:step AS interval) AS end_time,
+               COUNT(e.id) AS event_count,
+               AVG(a.severity_score) AS average_severity
+        FROM generate_series(
+            CAST(:t0 AS timestamp),
+            CAST(:t1 AS timestamp) - interval '1 microsecond',
+            CAST(:step AS interval)
+        ) AS gs(bucket)
+        LEFT JOIN events e
+            ON e.timestamp >= gs.bucket AND e.timestamp < gs.bucket + CAST(:step AS interval)
+        LEFT JOIN event_analytics a ON a.event_id = e.id
+        GROUP BY gs.bucket
+        ORDER BY gs.bucket
+    """), {"t0": time_threshold, "t1": now, "step": step})).all()
+    
+    result = [{
+        "start_time": row.start_time,
+        "end_time": row.end_time,
+        "event_count": row.event_count,
+        "average_severity": float(row.average_severity) if row.average_severity else 0
+    } for row in rows]
     
-    # generate time intervals
-    intervals = []
-    current_time = time_threshold
-    while current_time < datetime.utcnow():
-        interval_end = current_time + timedelta(minutes=interval_minutes)
-        
-        # count events in interval
-        event_count = db.query(func.count(Event.id)).filter(
-            Event.timestamp >= current_time,
-            Event.timestamp < interval_end
-        ).scalar()
-        
-        # get average severity
-        avg_severity = db.query(
-            func.avg(EventAnalytics.severity_score)
-        ).join(Event).filter(
-            Event.timestamp >= current_time,
-            Event.timestamp < interval_end
-        ).scalar()
-        
-        intervals.append({
-            "start_time": current_time,
-            "end_time": interval_end,
-            "event_count": event_count,
-            "average_severity": float(avg_severity) if avg_severity else 0
-        })
-        
-        current_time = interval_end
-    
-    return intervals
+    _response_cache[key] = result
+    return result
 
 @router.get("/analytics/response-metrics")
 async def get_response_metrics(
     time_range: int = 24,  # hours
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get response time metrics"""
+    key = ('response-metrics', time_range, int(time.time() // 60))
+    if key in _response_cache:
+        return _response_cache[key]
+    
     time_threshold = datetime.utcnow() - timedelta(hours=time_range)
     
-    metrics = db.query(
-        Event.risk_level,
-        func.avg(EventAnalytics.response_time).label('avg_response_time'),
-        func.min(EventAnalytics.response_time).label('min_response_time'),
-        func.max(EventAnalytics.response_time).label('max_response_time'),
-        func.count(Event.id).label('event_count')
-    ).join(EventAnalytics).filter(
-        Event.timestamp >= time_threshold
-    ).group_by(Event.risk_level).all()
-    
-    return {
+    metrics = (await db.execute(text(f"""
+        SELECT risk_level,
+               SUM(sum_rt) / NULLIF(SUM(cnt_rt), 0) AS avg_response_time,
+               MIN(min_rt) AS min_response_time,
+               MAX(max_rt) AS max_response_time,
+               SUM(cnt)::bigint AS event_count
+        FROM ({_WINDOW_PARTS_SQL}) parts
+        GROUP BY risk_level
+    """), _window_params(time_threshold))).all()
+    
+    result = {
         "overall_metrics": {
             "risk_levels": {
                 metric.risk_level: {
                     "average_response_time": float(metric.avg_response_time) if metric.avg_response_time else 0,
                     "min_response_time": float(metric.min_response_time) if metric.min_response_time else 0,
                     "max_response_time": float(metric.max_response_time) if metric.max_response_time else 0,
-                    "event_count": metric.event_count
+                    "event_count": int(metric.event_count)
                 } for metric in metrics
             }
         },
-        "response_time_distribution": calculate_response_distribution(db, time_threshold)
+        "response_time_distribution": await calculate_response_distribution(db, time_threshold)
     }
+    
+    _response_cache[key] = result
+    return result
 
-def calculate_response_distribution(db: Session, time_threshold: datetime):
+async def calculate_response_distribution(db: AsyncSession, time_threshold: datetime):
     """Calculate distribution of response times"""
     ranges = [
         (0, 300),      # 0-5 minutes
@@ -188,27 +285,51 @@ def calculate_response_distribution(db: Session, time_threshold: datetime):
         (3600, None)   # Over 60 minutes
     ]
     
+    # width_bucket maps each response time to its range index in one scan:
+    # 0 below the first bound, len(bounds) at or above the last
+    bounds = [float(start) for start, _ in ranges[1:]]
+    counts = dict((await db.execute(text("""
+        SELECT width_bucket(a.response_time, CAST(:bounds AS float8[])) AS bucket,
+               COUNT(*) AS count
+        FROM event_analytics a
+        JOIN events e ON e.id = a.event_id
+        WHERE e.timestamp >= :t0 AND a.response_time >= 0
+        GROUP BY bucket
+    """), {"bounds": bounds, "t0": time_threshold})).all())
+    
     distribution = {}
-    for start, end in ranges:
-        query = db.query(func.count(EventAnalytics.id)).\
-            join(Event).\
-            filter(Event.timestamp >= time_threshold)
-        
-        if end:
-            query = query.filter(
-                EventAnalytics.response_time >= start,
-                EventAnalytics.response_time < end
-            )
-        else:
-            query = query.filter(EventAnalytics.response_time >= start)
-        
-        count = query.scalar()
-        
+    for bucket, (start, end) in enumerate(ranges):
         if end:
             key = f"{start//60}-{end//60} mins"
         else:
             key = f">{start//60} mins"
             
-        distribution[key] = count
+        distribution[key] = counts.get(bucket, 0)
     
-    return distribution
\ No newline at end of file
+    return distribution
+
+async def refresh_analytics_summary():
+    """Refresh the hourly rollup without blocking readers"""
+    async with SessionLocal() as db:
+        await db.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY analytics_summary_hourly"))
+        await db.commit()
+
+async def _refresh_analytics_summary_loop():
+    while True:
+        try:
+            await refresh_analytics_summary()
+        except Exception as e:
+            logger.error(f"Error refreshing analytics summary: {e}")
+        await asyncio.sleep(SUMMARY_REFRESH_INTERVAL)
+
+@router.on_event("startup")
+async def start_summary_refresh():
+    """Keep the hourly rollup fresh while the app is running"""
+    global _refresh_task
+    _refresh_task = asyncio.create_task(_refresh_analytics_summary_loop())
+
+@router.on_event("shutdown")
+async def stop_summary_refresh():
+    """Cancel the rollup refresh task"""
+    if _refresh_task is not None:
+        _refresh_task.cancel()
\ No newline at end of file
@@ -1,13 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy import select, func, cast, case, literal_column, JSON, Text
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from geoalchemy2.functions import ST_AsGeoJSON
-import json
 
 from ...database import get_db
-from ...models import Event, EventAnalytics
+from ...models import Event
 from ..schemas.events import (
     EventCreate, 
     EventResponse, 
@@ -17,11 +17,36 @@ from ..schemas.events import (
 
 router = APIRouter()
 
+# heatmap cell size in degrees (~100 m at the equator)
+HEATMAP_GRID_SIZE = 0.001
+
+# heatmap weight per risk level
+_RISK_WEIGHT = {'high': 1.0, 'medium': 0.6, 'low': 0.3}
+
 @router.post("/events", response_model=EventResponse)
-async def create_event(event: EventCreate, db: Session = Depends(get_db)):
+async def create_event(event: EventCreate, db: AsyncSession = Depends(get_db)):
     """Create a new event"""
-    db_event = Event(
-        timestamp=event.timestamp,
+    db_event = event_to_model(event)
+    
+    # the events_create_analytics trigger fills in the analytics row
+    # (severity and zone risk) in the same statement
+    db.add(db_event)
+    await db.commit()
+    await db.refresh(db_event, ['analytics', 'latitude', 'longitude'])
+    
+    return db_event
+
+async def create_events(db: AsyncSession, events: List[EventCreate]) -> List[Event]:
+    """Insert events as one multi-row INSERT; ids are assigned, the caller commits"""
+    db_events = [event_to_model(event) for event in events]
+    db.add_all(db_events)
+    await db.flush()
+    return db_events
+
+def event_to_model(event: EventCreate) -> Event:
+    """Build an Event row from the create schema"""
+    return Event(
+        timestamp=to_naive_utc(event.timestamp),
         location=f'POINT({event.longitude} {event.latitude})',
         terrain_type=event.terrain_type,
         land_use=event.land_use,
@@ -36,23 +61,12 @@ async def create_event(event: EventCreate, db: Session = Depends(get_db)):
         detection_data=event.detection_data,
         image_path=event.image_path
     )
-    
-    db.add(db_event)
-    db.commit()
-    db.refresh(db_event)
-    
-    # Create analytics entry
-    analytics = EventAnalytics(
-        event_id=db_event.id,
-        severity_score=calculate_severity_score(event),
-        confidence_score=event.detection_confidence,
-        zone_risk_level=calculate_zone_risk(db, event)
-    )
-    
-    db.add(analytics)
-    db.commit()
-    
-    return db_event
+
+def to_naive_utc(ts: datetime) -> datetime:
+    """Normalize a timestamp to naive UTC, as stored in the timestamp columns"""
+    if ts.tzinfo is None:
+        return ts
+    return ts.astimezone(timezone.utc).replace(tzinfo=None)
 
 @router.get("/events", response_model=List[EventResponse])
 async def get_events(
@@ -60,110 +74,77 @@ async def get_events(
     limit: int = 100,
     risk_level: Optional[str] = None,
     time_range: Optional[int] = None,  # minutes
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get events with optional filtering"""
-    query = db.query(Event)
+    # load analytics for the whole page in one extra query instead of one
+    # lazy load per event during response serialization
+    query = select(Event).options(selectinload(Event.analytics))
     
     if risk_level:
-        query = query.filter(Event.risk_level == risk_level)
+        query = query.where(Event.risk_level == risk_level)
     
     if time_range:
         time_threshold = datetime.utcnow() - timedelta(minutes=time_range)
-        query = query.filter(Event.timestamp >= time_threshold)
+        query = query.where(Event.timestamp >= time_threshold)
     
-    events = query.order_by(Event.timestamp.desc()).offset(skip).limit(limit).all()
-    return events
-
-@router.get("/events/{event_id}", response_model=EventResponse)
-async def get_event(event_id: int, db: Session = Depends(get_db)):
-    """Get specific event details"""
-    event = db.query(Event).filter(Event.id == event_id).first()
-    if not event:
-        raise HTTPException(status_code=404, detail="Event not found")
-    return event
+    result = await db.execute(query.order_by(Event.timestamp.desc()).offset(skip).limit(limit))
+    return result.scalars().all()
 
 @router.get("/events/heatmap")
 async def get_heatmap_data(
     time_range: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get heatmap data for events"""
-    query = db.query(
-        Event.location,
-        Event.risk_level,
+    # snap points to a ~100 m grid so nearby events share a heatmap cell
+    cell = func.ST_SnapToGrid(Event.location, HEATMAP_GRID_SIZE)
+    query = select(
+        cell.label('location'),
+        Event.risk_level.label('risk_level'),
         func.count(Event.id).label('event_count')
     )
     
     if time_range:
         time_threshold = datetime.utcnow() - timedelta(minutes=time_range)
-        query = query.filter(Event.timestamp >= time_threshold)
-    
-    query = query.group_by(Event.location, Event.risk_level)
-    
-    results = query.all()
+        query = query.where(Event.timestamp >= time_threshold)
     
-    heatmap_data = [{
-        'location': json.loads(db.scalar(ST_AsGeoJSON(result.location))),
-        'risk_level': result.risk_level,
-        'weight': result.event_count * get_risk_weight(result.risk_level)
-    } for result in results]
+    grouped = query.group_by(cell, Event.risk_level).subquery()
     
-    return heatmap_data
-
-def calculate_severity_score(event: EventCreate) -> float:
-    """Calculate event severity score"""
-    base_score = {
-        'high': 1.0,
-        'medium': 0.6,
-        'low': 0.3
-    }.get(event.risk_level, 0.3)
-    
-    # adjust for weapons
-    if event.weapons_present:
-        base_score *= 1.5
-    
-    # adjust for number of people
-    people_factor = min(event.num_people / 10, 1.0)
-    base_score *= (1 + people_factor)
+    weight = case(
+        _RISK_WEIGHT,
+        value=grouped.c.risk_level,
+        else_=0.3
+    )
     
-    return min(base_score, 1.0)
+    # postgres builds the whole JSON array; the text is returned as-is,
+    # so no per-point Python objects are created
+    heatmap_json = await db.scalar(select(
+        cast(
+            func.coalesce(
+                func.json_agg(func.json_build_object(
+                    'location', cast(ST_AsGeoJSON(grouped.c.location), JSON),
+                    'risk_level', grouped.c.risk_level,
+                    'weight', grouped.c.event_count * weight
+                )),
+                literal_column("'[]'::json")
+            ),
+            Text
+        )
+    ))
+    
+    return Response(content=heatmap_json, media_type="application/json")
 
-def calculate_zone_risk(db: Session, event: EventCreate) -> str:
-    """Calculate risk level for the zone"""
-    # Query nearby events in last hour
-    hour_ago = datetime.utcnow() - timedelta(hours=1)
-    nearby_events = db.query(Event).filter(
-        func.ST_DWithin(
-            Event.location,
-            f'POINT({event.longitude} {event.latitude})',
-            1000  # 1km radius
-        ),
-        Event.timestamp >= hour_ago
-    ).all()
-    
-    if not nearby_events:
-        return 'low'
-    
-    # calculate average risk
-    risk_scores = {
-        'high': 3,
-        'medium': 2,
-        'low': 1
-    }
-    
-    avg_risk = sum(risk_scores[e.risk_level] for e in nearby_events) / len(nearby_events)
-    
-    if avg_risk >= 2.5:
-        return 'high'
-    elif avg_risk >= 1.5:
-        return 'medium'
-    return 'low'
+@router.get("/events/{event_id}", response_model=EventResponse)
+async def get_event(event_id: int, db: AsyncSession = Depends(get_db)):
+    """Get specific event details"""
+    event = await db.scalar(
+        select(Event).options(joinedload(Event.analytics)).where(Event.id == event_id)
+    )
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    return event
 
 def get_risk_weight(risk_level: str) -> float:
     """Get weight multiplier for risk level"""
-    return {
-        'high': 1.0,
-        'medium': 0.6,
-        'low': 0.3
-    }.get(risk_level, 0.3)
\ No newline at end of file
+    return _RISK_WEIGHT.get(risk_level, 0.3)
\ No newline at end of file
@@ -37,10 +37,10 @@ class EventUpdate(BaseModel):
     detection_confidence: Optional[float] = Field(None, ge=0, le=1)
 
 class EventAnalyticsBase(BaseModel):
-    response_time: float
+    response_time: Optional[float]
     event_duration: Optional[float]
     zone_risk_level: RiskLevel
-    nearby_events_count: int
+    nearby_events_count: Optional[int]
     severity_score: float = Field(..., ge=0, le=1)
     confidence_score: float = Field(..., ge=0, le=1)
 
@@ -1,5 +1,5 @@
-from database import engine, Base
-from models import Event, EventAnalytics
+from server.database import engine
+from server.models import init_db as create_schema
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -7,8 +7,8 @@ logger = logging.getLogger(__name__)
 
 def init_db():
     logger.info("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
+    create_schema(engine)
     logger.info("Database tables created successfully!")
 
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    init_db()
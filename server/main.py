@@ -1,15 +1,23 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 from datetime import datetime
-import geopandas as gpd
-from shapely.geometry import Point
+from sqlalchemy import select, func, case
+from sqlalchemy.ext.asyncio import AsyncSession
+from geoalchemy2.functions import ST_AsGeoJSON
 import json
 from pathlib import Path
-import asyncio
 import logging
 import base64
+import asyncio
+import aiofiles
+
+from .database import get_db
+from .models import Event as EventModel
+from .api.routes import events, analytics
+from .api.schemas.events import EventCreate
 
 class Location(BaseModel):
     latitude: float
@@ -34,8 +42,15 @@ class Event(BaseModel):
     location: Location
     analysis: Analysis
     image_data: str  # Base64 encoded image
+    detection_confidence: float = 0.0
+    detection_data: Dict[str, Any] = {}
 
-app = FastAPI(title="Drone Surveillance API")
+# orjson serializes datetimes and nested lists natively and much faster
+# than the stdlib encoder
+app = FastAPI(
+    title="Drone Surveillance API",
+    default_response_class=ORJSONResponse
+)
 
 # CORS middleware
 app.add_middleware(
@@ -46,123 +61,182 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# initialize GeoDataFrame for events
-events_gdf = gpd.GeoDataFrame(
-    columns=['id', 'timestamp', 'location', 'analysis', 'geometry'],
-    geometry='geometry'
-)
+app.include_router(analytics.router, prefix="/api")
+app.include_router(events.router, prefix="/api/v2")
+
+# the endpoints below keep the drone/frontend wire format (nested payloads,
+# GeoJSON features) on top of the SQL-backed events layer
 
 @app.post("/api/events")
-async def create_event(event: Event):
+async def create_event(event: Event, db: AsyncSession = Depends(get_db)):
     """Record a new violence detection event"""
     try:
-        # create geometry point
-        point = Point(event.location.longitude, event.location.latitude)
-        
-        # add to GeoDataFrame
-        new_row = {
-            'id': str(len(events_gdf)),
-            'timestamp': event.timestamp,
-            'location': event.location.dict(),
-            'analysis': event.analysis.dict(),
-            'geometry': point
-        }
-        
-        events_gdf.loc[len(events_gdf)] = new_row
-        
-        # save image
-        image_path = Path(f"data/images/{new_row['id']}.jpg")
-        save_image(event.image_data, image_path)
-        
-        return {"id": new_row['id']}
-    
+        # flush for the id, write the image, then commit once so a failed
+        # write leaves no event behind for the drone's retry to duplicate
+        db_event = events.event_to_model(to_event_create(event))
+        db.add(db_event)
+        await db.flush()
+
+        image_path = Path(f"data/images/{db_event.id}.jpg")
+        await save_image(event.image_data, image_path)
+        db_event.image_path = str(image_path)
+        await db.commit()
+
+        return {"id": str(db_event.id)}
+
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/events:batch")
+async def create_events_batch(batch: List[Event], db: AsyncSession = Depends(get_db)):
+    """Record several violence detection events in one transaction"""
+    try:
+        db_events = await events.create_events(db, [to_event_create(event) for event in batch])
+
+        # write all images concurrently, then commit rows and paths together;
+        # any failure rolls the whole batch back
+        image_paths = [Path(f"data/images/{db_event.id}.jpg") for db_event in db_events]
+        await asyncio.gather(*(
+            save_image(event.image_data, path)
+            for event, path in zip(batch, image_paths)
+        ))
+        for db_event, path in zip(db_events, image_paths):
+            db_event.image_path = str(path)
+        await db.commit()
+
+        return {"ids": [str(db_event.id) for db_event in db_events]}
+
     except Exception as e:
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/events")
 async def get_events(
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
-    risk_level: Optional[str] = None
+    risk_level: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
 ):
     """Get filtered events"""
-    filtered_gdf = events_gdf.copy()
-    
+    query = select(EventModel, ST_AsGeoJSON(EventModel.location).label('loc_json'))
+
     if start_time:
-        filtered_gdf = filtered_gdf[filtered_gdf['timestamp'] >= start_time]
+        query = query.where(EventModel.timestamp >= events.to_naive_utc(start_time))
     if end_time:
-        filtered_gdf = filtered_gdf[filtered_gdf['timestamp'] <= end_time]
+        query = query.where(EventModel.timestamp <= events.to_naive_utc(end_time))
     if risk_level:
-        filtered_gdf = filtered_gdf[
-            filtered_gdf['analysis'].apply(lambda x: x['risk_level'] == risk_level)
-        ]
-    
-    # convert to GeoJSON
-    geojson = filtered_gdf.to_crs(epsg=4326).__geo_interface__
-    
+        query = query.where(EventModel.risk_level == risk_level)
+
+    result = await db.execute(query.order_by(EventModel.timestamp.desc()))
+
     return {
         "type": "FeatureCollection",
-        "features": geojson['features']
+        "features": [to_feature(event, loc_json) for event, loc_json in result]
     }
 
 @app.get("/api/events/{event_id}")
-async def get_event(event_id: str):
+async def get_event(event_id: int, db: AsyncSession = Depends(get_db)):
     """Get details for a specific event"""
-    event = events_gdf[events_gdf['id'] == event_id]
-    if event.empty:
+    row = (await db.execute(
+        select(EventModel, ST_AsGeoJSON(EventModel.location).label('loc_json'))
+        .where(EventModel.id == event_id)
+    )).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="Event not found")
-    
+
     # get image data
-    image_path = Path(f"data/images/{event_id}.jpg")
+    event, loc_json = row
     image_data = None
-    if image_path.exists():
-        with open(image_path, "rb") as f:
-            image_data = base64.b64encode(f.read()).decode()
-    
+    if event.image_path and Path(event.image_path).exists():
+        async with aiofiles.open(event.image_path, "rb") as f:
+            image_data = base64.b64encode(await f.read()).decode()
+
     return {
-        "event": event.iloc[0].to_dict(),
+        "event": to_feature(event, loc_json)['properties'],
         "image": image_data
     }
 
 @app.get("/api/heatmap")
 async def get_heatmap(
     start_time: Optional[datetime] = None,
-    end_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db)
 ):
     """Generate heatmap data for events"""
-    filtered_gdf = events_gdf.copy()
-    
+    query = select(
+        func.ST_Y(EventModel.location).label('lat'),
+        func.ST_X(EventModel.location).label('lng'),
+        case(
+            {'low': 1, 'medium': 2},
+            value=EventModel.risk_level,
+            else_=3
+        ).label('intensity')
+    )
+
     if start_time:
-        filtered_gdf = filtered_gdf[filtered_gdf['timestamp'] >= start_time]
+        query = query.where(EventModel.timestamp >= events.to_naive_utc(start_time))
     if end_time:
-        filtered_gdf = filtered_gdf[filtered_gdf['timestamp'] <= end_time]
-    
-    # create heatmap data
-    heatmap_data = []
-    for _, row in filtered_gdf.iterrows():
-        point = row['geometry']
-        intensity = 1 if row['analysis']['risk_level'] == 'low' else \
-                   2 if row['analysis']['risk_level'] == 'medium' else 3
-        
-        heatmap_data.append({
-            'lat': point.y,
-            'lng': point.x,
-            'intensity': intensity
-        })
-    
-    return heatmap_data
-
-def save_image(image_data: str, path: Path):
-    """Save base64 encoded image to file"""
+        query = query.where(EventModel.timestamp <= events.to_naive_utc(end_time))
+
+    return [
+        {'lat': row.lat, 'lng': row.lng, 'intensity': row.intensity}
+        for row in await db.execute(query)
+    ]
+
+def to_event_create(event: Event) -> EventCreate:
+    """Flatten the drone's nested payload into the events schema"""
+    return EventCreate(
+        timestamp=event.timestamp,
+        latitude=event.location.latitude,
+        longitude=event.location.longitude,
+        terrain_type=event.location.terrain_type,
+        land_use=event.location.land_use,
+        detection_confidence=event.detection_confidence,
+        detection_data=event.detection_data,
+        **event.analysis.dict()
+    )
+
+def to_feature(event: EventModel, loc_json: str) -> Dict[str, Any]:
+    """Convert an event row to a GeoJSON feature in the frontend's layout"""
+    geometry = json.loads(loc_json)
+    longitude, latitude = geometry['coordinates']
+
+    return {
+        "type": "Feature",
+        "geometry": geometry,
+        "properties": {
+            "id": str(event.id),
+            "timestamp": event.timestamp,
+            "location": {
+                "latitude": latitude,
+                "longitude": longitude,
+                "terrain_type": event.terrain_type,
+                "land_use": event.land_use
+            },
+            "analysis": {
+                "num_people": event.num_people,
+                "violence_type": event.violence_type,
+                "weapons_present": event.weapons_present,
+                "weapon_types": event.weapon_types,
+                "risk_level": event.risk_level,
+                "terrain_context": event.terrain_context,
+                "recommended_actions": event.recommended_actions
+            }
+        }
+    }
+
+async def save_image(image_data: str, path: Path):
+    """Save base64 encoded image to file without blocking the event loop"""
     try:
         image_bytes = base64.b64decode(image_data)
         path.parent.mkdir(parents=True, exist_ok=True)
-        with open(path, "wb") as f:
-            f.write(image_bytes)
+        async with aiofiles.open(path, "wb") as f:
+            await f.write(image_bytes)
     except Exception as e:
         logging.error(f"Error saving image: {e}")
         raise
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Boolean, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, func
+from sqlalchemy.orm import relationship, column_property
+from sqlalchemy.dialects.postgresql import JSONB
 from geoalchemy2 import Geometry
 from datetime import datetime
 from .database import Base
@@ -10,6 +11,8 @@ class Event(Base):
     id = Column(Integer, primary_key=True, index=True)
     timestamp = Column(DateTime, default=datetime.utcnow)
     location = Column(Geometry('POINT', srid=4326))
+    latitude = column_property(func.ST_Y(location, type_=Float))
+    longitude = column_property(func.ST_X(location, type_=Float))
     terrain_type = Column(String)
     land_use = Column(String)
     
@@ -17,14 +20,14 @@ class Event(Base):
     num_people = Column(Integer)
     violence_type = Column(String)
     weapons_present = Column(Boolean, default=False)
-    weapon_types = Column(JSON)  # array of weapon types
+    weapon_types = Column(JSONB)  # array of weapon types
     risk_level = Column(String)  # 'low', 'medium', 'high'
     terrain_context = Column(String)
-    recommended_actions = Column(JSON)  # array of actions
+    recommended_actions = Column(JSONB)  # array of actions
     
     # detection data
     detection_confidence = Column(Float)
-    detection_data = Column(JSON)  # raw detection data
+    detection_data = Column(JSONB)  # raw detection data
     
     # image data (stored as path or URL)
     image_path = Column(String)
@@ -50,5 +53,131 @@ class EventAnalytics(Base):
     
     event = relationship("Event", back_populates="analytics")
 
+# everything past the plain tables lives here, so init_db is the one schema
+# path; each statement is safe to re-run against an existing database
+SERVER_SIDE_DDL = (
+    # tables created before the JSONB switch still carry json columns
+    """
+    DO $$
+    DECLARE
+        col text;
+    BEGIN
+        FOREACH col IN ARRAY ARRAY['weapon_types', 'recommended_actions', 'detection_data'] LOOP
+            IF EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'events' AND column_name = col AND data_type = 'json'
+            ) THEN
+                EXECUTE format('ALTER TABLE events ALTER COLUMN %I TYPE jsonb USING %I::jsonb', col, col);
+            END IF;
+        END LOOP;
+    END $$
+    """,
+    # newest-first listing filtered by risk level walks this index in order
+    # instead of sorting; the included columns let summary-style reads skip the heap
+    """
+    CREATE INDEX IF NOT EXISTS ix_events_ts_risk
+    ON events (timestamp DESC, risk_level)
+    INCLUDE (id, num_people, weapons_present, detection_confidence)
+    """,
+    # ix_events_ts_risk leads with timestamp, so a plain timestamp index only
+    # adds insert cost
+    "DROP INDEX IF EXISTS ix_events_timestamp",
+    # containment/existence lookups on weapon types (weapon_types ? 'knife')
+    "CREATE INDEX IF NOT EXISTS ix_events_weapon_types_gin ON events USING gin (weapon_types)",
+    # metre-based ST_DWithin casts location to geography; the plain GIST index
+    # on the geometry column can't serve that, so index the cast expression
+    # too, spelled exactly as queried so the planner matches it. An index
+    # built on a typmod cast (geography(Geometry,4326)) never matches and is
+    # rebuilt
+    """
+    DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM pg_indexes
+            WHERE indexname = 'ix_events_location_geog'
+              AND strpos(indexdef, '(location)::geography)') = 0
+        ) THEN
+            DROP INDEX ix_events_location_geog;
+        END IF;
+    END $$
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_events_location_geog
+    ON events USING gist ((location::geography))
+    """,
+    """
+    CREATE OR REPLACE FUNCTION create_event_analytics() RETURNS trigger AS $$
+    DECLARE
+        hour_ago timestamp := (now() AT TIME ZONE 'utc') - interval '1 hour';
+        avg_risk float;
+    BEGIN
+        SELECT AVG(score) INTO avg_risk
+        FROM (
+            SELECT CASE risk_level WHEN 'high' THEN 3 WHEN 'medium' THEN 2 ELSE 1 END AS score
+            FROM events
+            WHERE id <> NEW.id
+              AND ST_DWithin(location::geography, NEW.location::geography, 1000)
+              AND timestamp >= hour_ago
+            UNION ALL
+            SELECT CASE NEW.risk_level WHEN 'high' THEN 3 WHEN 'medium' THEN 2 ELSE 1 END
+            WHERE NEW.timestamp >= hour_ago
+        ) nearby;
+
+        INSERT INTO event_analytics (
+            event_id, timestamp, severity_score, confidence_score, zone_risk_level
+        )
+        VALUES (
+            NEW.id,
+            now() AT TIME ZONE 'utc',
+            LEAST(
+                CASE NEW.risk_level WHEN 'high' THEN 1.0 WHEN 'medium' THEN 0.6 ELSE 0.3 END
+                * CASE WHEN NEW.weapons_present THEN 1.5 ELSE 1.0 END
+                * (1 + LEAST(COALESCE(NEW.num_people, 0) / 10.0, 1.0)),
+                1.0
+            ),
+            NEW.detection_confidence,
+            CASE
+                WHEN avg_risk >= 2.5 THEN 'high'
+                WHEN avg_risk >= 1.5 THEN 'medium'
+                ELSE 'low'
+            END
+        );
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS events_create_analytics ON events",
+    """
+    CREATE TRIGGER events_create_analytics
+    AFTER INSERT ON events
+    FOR EACH ROW EXECUTE FUNCTION create_event_analytics()
+    """,
+    """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS analytics_summary_hourly AS
+    SELECT date_trunc('hour', e.timestamp) AS bucket,
+           e.risk_level,
+           count(*) AS cnt,
+           sum(a.severity_score) AS sum_sev,
+           count(a.severity_score) AS cnt_sev,
+           sum(a.response_time) AS sum_rt,
+           count(a.response_time) AS cnt_rt,
+           min(a.response_time) AS min_rt,
+           max(a.response_time) AS max_rt
+    FROM events e
+    JOIN event_analytics a ON a.event_id = e.id
+    GROUP BY 1, 2
+    """,
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS ix_analytics_summary_hourly_bucket_risk
+    ON analytics_summary_hourly (bucket, risk_level)
+    """,
+)
+
 def init_db(engine):
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    # no_parameters hands the DDL to the driver as-is, so the % in format()
+    # isn't read as a placeholder
+    with engine.begin() as conn:
+        conn = conn.execution_options(no_parameters=True)
+        for statement in SERVER_SIDE_DDL:
+            conn.exec_driver_sql(statement)
\ No newline at end of file
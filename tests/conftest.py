@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# the server is imported as a package, drone modules import each other flat
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "drone"))
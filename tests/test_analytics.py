@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("geoalchemy2")
+pytest.importorskip("cachetools")
+pytest.importorskip("dotenv")
+pytest.importorskip("asyncpg")
+pytest.importorskip("psycopg2")
+
+from server.api.routes.analytics import calculate_response_distribution, _window_params
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+class FakeSession:
+    """Returns canned (bucket, count) rows and records the bound parameters"""
+    def __init__(self, rows):
+        self.rows = rows
+        self.params = None
+
+    async def execute(self, statement, params=None):
+        self.params = params
+        return FakeResult(self.rows)
+
+def run_distribution(rows):
+    db = FakeSession(rows)
+    distribution = asyncio.run(calculate_response_distribution(db, datetime(2024, 1, 1)))
+    return db, distribution
+
+def test_bucket_indexes_map_to_labels():
+    _, distribution = run_distribution([(0, 4), (2, 1), (4, 7)])
+    assert distribution == {
+        "0-5 mins": 4,
+        "5-10 mins": 0,
+        "10-30 mins": 1,
+        "30-60 mins": 0,
+        ">60 mins": 7
+    }
+
+def test_bounds_are_the_range_starts_after_zero():
+    db, _ = run_distribution([])
+    assert db.params["bounds"] == [300.0, 600.0, 1800.0, 3600.0]
+
+def test_empty_window_has_every_label():
+    _, distribution = run_distribution([])
+    assert list(distribution) == ["0-5 mins", "5-10 mins", "10-30 mins", "30-60 mins", ">60 mins"]
+    assert all(count == 0 for count in distribution.values())
+
+def test_rollup_range_starts_at_first_whole_hour():
+    params = _window_params(datetime(2024, 1, 1, 10, 15))
+    assert params["rollup_from"] == datetime(2024, 1, 1, 11)
+    
+    params = _window_params(datetime(2024, 1, 1, 10))
+    assert params["rollup_from"] == datetime(2024, 1, 1, 10)
+
+def test_rollup_range_leaves_recent_hours_to_raw_tables():
+    params = _window_params(datetime.utcnow() - timedelta(hours=1))
+    # the rollup never covers the current hour, so a one-hour window is
+    # mostly or entirely read from the raw tables
+    assert params["rollup_to"] <= datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    assert params["rollup_to"].minute == 0
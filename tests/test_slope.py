@@ -0,0 +1,28 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("numba")
+
+from slope import slope_kernel
+
+def reference_slope(elevation_matrix, cell_size):
+    """The np.gradient formulation the kernel replaced"""
+    dy, dx = np.gradient(elevation_matrix, cell_size)
+    slope = np.arctan(np.sqrt(dx**2 + dy**2))
+    return float(np.degrees(slope).mean())
+
+@pytest.mark.parametrize("cell_size", [1.0, 10.0, 30.0])
+def test_slope_kernel_matches_np_gradient(cell_size):
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        window = rng.uniform(0, 500, size=(3, 3))
+        assert slope_kernel(window, cell_size) == pytest.approx(
+            reference_slope(window, cell_size), rel=1e-6
+        )
+
+def test_slope_kernel_non_square_window():
+    window = np.random.default_rng(1).uniform(0, 100, size=(3, 5))
+    assert slope_kernel(window, 5.0) == pytest.approx(reference_slope(window, 5.0), rel=1e-6)
+
+def test_slope_kernel_flat_terrain():
+    assert slope_kernel(np.full((3, 3), 42.0), 30.0) == 0.0
@@ -0,0 +1,93 @@
+import logging
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("torch")
+pytest.importorskip("cv2")
+pytest.importorskip("PIL")
+
+from video_processor import VideoProcessor
+
+def make_processor(violence_threshold=0.7):
+    """VideoProcessor with only the state _analyze_violence reads (no model)"""
+    processor = object.__new__(VideoProcessor)
+    processor.violence_threshold = violence_threshold
+    processor.person_class_id = 0
+    processor._violence_ids = np.array([1, 2, 3, 7, 9], dtype=np.int32)
+    processor._weapon_ids = np.array([4, 5, 6], dtype=np.int32)
+    processor.running = False
+    processor.logger = logging.getLogger(__name__)
+    return processor
+
+def make_detections(class_ids, confidences, bboxes):
+    return {
+        'class_id': np.array(class_ids, dtype=np.int32),
+        'confidence': np.array(confidences, dtype=np.float32),
+        'bbox': np.array(bboxes, dtype=np.float32).reshape(-1, 4)
+    }
+
+CLOSE_PAIR = [[0, 0, 10, 20], [1, 0, 11, 20]]
+FAR_PAIR = [[0, 0, 10, 20], [500, 0, 510, 20]]
+
+def test_box_distances_are_normalized_by_row_diagonal():
+    distances = make_processor()._calculate_box_distances(
+        np.array(CLOSE_PAIR + [[0, 0, 20, 40]], dtype=np.float32)
+    )
+    assert distances.shape == (3, 3)
+    assert distances[0, 1] == pytest.approx(1 / np.sqrt(500))
+    # same centre offset, larger box: smaller normalized distance from its row
+    assert distances[2, 0] < distances[0, 2]
+
+def test_no_detections():
+    assert make_processor()._analyze_violence(make_detections([], [], [])) == (False, 0.0)
+
+def test_close_persons_add_proximity_score():
+    detections = make_detections([0, 0], [0.9, 0.9], CLOSE_PAIR)
+    detected, score = make_processor()._analyze_violence(detections)
+    assert not detected  # 0.6 is below the default 0.7 threshold
+    assert score == pytest.approx(0.6)
+    
+    detected, score = make_processor(violence_threshold=0.5)._analyze_violence(detections)
+    assert detected
+    assert score == pytest.approx(0.6)
+
+def test_distant_persons_are_not_suspicious():
+    detected, score = make_processor(violence_threshold=0.5)._analyze_violence(
+        make_detections([0, 0], [0.9, 0.9], FAR_PAIR)
+    )
+    assert not detected
+    assert score == 0.0
+
+def test_single_person_is_not_suspicious():
+    assert make_processor(violence_threshold=0.5)._analyze_violence(
+        make_detections([0], [0.9], [[0, 0, 10, 20]])
+    ) == (False, 0.0)
+
+def test_weapon_decides_frame_below_threshold():
+    detected, score = make_processor()._analyze_violence(
+        make_detections([5], [0.3], [[0, 0, 10, 10]])
+    )
+    assert detected
+    assert score == pytest.approx(0.3)
+
+def test_confident_violence_class_decides_frame():
+    detected, score = make_processor()._analyze_violence(
+        make_detections([2], [0.8], [[0, 0, 10, 10]])
+    )
+    assert detected
+    assert score == pytest.approx(0.8)
+
+def test_weak_violence_class_alone_is_not_violence():
+    detected, score = make_processor()._analyze_violence(
+        make_detections([1], [0.5], [[0, 0, 10, 10]])
+    )
+    assert not detected
+    assert score == pytest.approx(0.5)
+
+def test_short_circuit_skips_proximity_score():
+    detected, score = make_processor()._analyze_violence(
+        make_detections([4, 0, 0], [0.4, 0.9, 0.9], [[50, 50, 60, 60]] + CLOSE_PAIR)
+    )
+    assert detected
+    assert score == pytest.approx(0.4)